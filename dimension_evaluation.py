@@ -3,7 +3,10 @@ import os
 import pickle
 from gensim.models import KeyedVectors 
 import json
+import itertools
 
+# Set to True to search thousands of generated candidate axes instead of only the predefined dimensions
+SEARCH_AXES = False
 
 def cosine_similarity(v1, v2):
     """
@@ -111,6 +114,268 @@ def find_best_dataset_dim(datasets, dims, test_words):
 
     return best_dataset, best_dim, min_error
 
+def unit_rows(matrix):
+    """
+    Normalizes every row of a matrix to unit length, so that dot products between rows are cosine similarities.
+    """
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def score_axes(axes, word_vectors, labels):
+    """
+    Scores a whole batch of candidate axes against labelled test words in a single matrix operation.
+    The error of an axis is the same as in find_best_dataset_dim: the average absolute difference between
+    the absolute cosine similarity of a test word to the axis and its label.
+
+    Args:
+        axes (np.ndarray): Candidate axes with the shape (number of candidates, dimensions).
+        word_vectors (np.ndarray): Unit length vectors of the test words with the shape (number of words, dimensions).
+        labels (np.ndarray): Labels of the test words, 1 for politically sensitive and 0 for neutral.
+
+    Returns:
+        np.ndarray: The average absolute error of every candidate axis.
+    """
+    projections = np.abs(word_vectors @ unit_rows(axes).T)
+    return np.mean(np.abs(projections - labels[:, None]), axis=0)
+
+
+def collect_pole_words(vectors, dims):
+    """
+    Collects the "left" and "right" words of all dimensions that are part of the embedding space.
+
+    Returns:
+        tuple: Two lists of unique words (left pool, right pool) and the two matrices of their vectors.
+    """
+    left_pool = list(dict.fromkeys(word for dim in dims.values() for word in dim["left"] if word in vectors.key_to_index))
+    right_pool = list(dict.fromkeys(word for dim in dims.values() for word in dim["right"] if word in vectors.key_to_index))
+    return left_pool, right_pool, np.array([vectors[word] for word in left_pool]), np.array([vectors[word] for word in right_pool])
+
+
+def random_subset_axes(vectors, dims, n_candidates, subset_size, rng):
+    """
+    Generates candidate axes from random subsets of the pole words of all dimensions.
+    Every candidate is the difference of the mean vector of subset_size random "left" words and the
+    mean vector of subset_size random "right" words.
+
+    Returns:
+        tuple: A list of candidate definitions (dicts with "left" and "right" word lists) and the matrix of axes.
+    """
+    left_pool, right_pool, left_vectors, right_vectors = collect_pole_words(vectors, dims)
+    # argsort of random numbers draws subsets without replacement for all candidates at once
+    left_idx = rng.random((n_candidates, len(left_pool))).argsort(axis=1)[:, :min(subset_size, len(left_pool))]
+    right_idx = rng.random((n_candidates, len(right_pool))).argsort(axis=1)[:, :min(subset_size, len(right_pool))]
+
+    axes = left_vectors[left_idx].mean(axis=1) - right_vectors[right_idx].mean(axis=1)
+    definitions = [
+        {"name": f"random_{i}", "left": [left_pool[j] for j in left_row], "right": [right_pool[j] for j in right_row]}
+        for i, (left_row, right_row) in enumerate(zip(left_idx, right_idx))
+    ]
+    return definitions, axes
+
+
+def dimension_combination_axes(vectors, dims):
+    """
+    Generates candidate axes as signed sums of the (unit length) axes of the existing dimensions,
+    e.g. "social+economic" or "social-environment". As only the absolute projection is used for scoring,
+    combinations that only differ in their overall sign are generated once.
+
+    Returns:
+        tuple: A list of candidate definitions (dicts with an "axis" vector) and the matrix of axes.
+    """
+    names = [name for name, dim in dims.items()
+             if any(word in vectors.key_to_index for word in dim["left"]) and any(word in vectors.key_to_index for word in dim["right"])]
+    dim_axes = unit_rows(np.array([create_vec_axis(vectors, dims[name]["left"], dims[name]["right"]) for name in names]))
+
+    signs = np.array([s for s in itertools.product([-1, 0, 1], repeat=len(names)) if any(s) and s[np.flatnonzero(s)[0]] == 1])
+    axes = signs @ dim_axes
+    definitions = [
+        {"name": "".join(("+" if sign == 1 else "-") + name for sign, name in zip(row, names) if sign).lstrip("+"), "axis": axis.tolist()}
+        for row, axis in zip(signs, axes)
+    ]
+    return definitions, axes
+
+
+def label_direction_axes(word_vectors, labels, n_components=3):
+    """
+    Generates candidate axes directly from labelled test words: the difference of the mean vectors of
+    sensitive and neutral words, and the first principal components of the sensitive words.
+
+    Returns:
+        tuple: A list of candidate definitions (dicts with an "axis" vector) and the matrix of axes.
+    """
+    sensitive = word_vectors[labels == 1]
+    neutral = word_vectors[labels == 0]
+    mean_difference = sensitive.mean(axis=0) - neutral.mean(axis=0)
+    # rows of vt are the principal directions of the centred sensitive words
+    _, _, vt = np.linalg.svd(sensitive - sensitive.mean(axis=0), full_matrices=False)
+
+    axes = np.vstack([mean_difference, vt[:n_components]])
+    names = ["difference_of_means"] + [f"pca_{i + 1}" for i in range(n_components)]
+    definitions = [{"name": name, "axis": axis.tolist()} for name, axis in zip(names, axes)]
+    return definitions, axes
+
+
+def greedy_pole_axes(vectors, dims, word_vectors, labels, max_size=10):
+    """
+    Greedily builds an axis from the pole words of all dimensions. It starts from the best pair of one
+    "left" and one "right" word and then repeatedly adds the pole word that reduces the error on the
+    labelled words the most. Every step scores all possible additions as one batch.
+
+    Returns:
+        tuple: A list of candidate definitions (one per size of the greedy path, dicts with "left" and "right"
+        word lists) and the matrix of axes.
+    """
+    left_pool, right_pool, left_vectors, right_vectors = collect_pole_words(vectors, dims)
+    n_left = len(left_pool)
+
+    # Best starting pair out of all left-right combinations
+    pair_axes = (left_vectors[:, None, :] - right_vectors[None, :, :]).reshape(-1, left_vectors.shape[1])
+    best_pair = int(np.argmin(score_axes(pair_axes, word_vectors, labels)))
+    left, right = [best_pair // len(right_pool)], [best_pair % len(right_pool)]
+
+    definitions, axes = [], []
+    for step in range(2, max_size + 1):
+        if step > 2:
+            left_sum, right_sum = left_vectors[left].sum(axis=0), right_vectors[right].sum(axis=0)
+            add_left = (left_sum + left_vectors) / (len(left) + 1) - right_sum / len(right)
+            add_right = left_sum / len(left) - (right_sum + right_vectors) / (len(right) + 1)
+            errors = score_axes(np.vstack([add_left, add_right]), word_vectors, labels)
+            errors[left] = np.inf # words can only be added once
+            errors[[n_left + i for i in right]] = np.inf
+            best = int(np.argmin(errors))
+            if best < n_left:
+                left.append(best)
+            else:
+                right.append(best - n_left)
+
+        definitions.append({"name": f"greedy_{step}", "left": [left_pool[i] for i in left], "right": [right_pool[i] for i in right]})
+        axes.append(left_vectors[left].mean(axis=0) - right_vectors[right].mean(axis=0))
+
+    return definitions, np.array(axes)
+
+
+def search_axes(vectors, dims, test_words, n_random=5000, subset_size=5, greedy_size=10, n_components=3, n_folds=5, n_selected=10, seed=0):
+    """
+    Generates thousands of candidate axes and selects the best of them on the labelled test words.
+    Candidates that do not depend on the labels (random subsets of pole words and combinations of the existing
+    dimensions) are generated once. Candidates that are fitted to the labels (greedy pole word selection and
+    directions derived from the labelled words) are refitted on the words they are selected on.
+
+    As picking the best out of thousands of candidates on 20 words overfits, the selection is evaluated with
+    nested cross-validation: in every fold, the n_selected best candidates are picked on the training words only
+    and their error is measured on the held-out words. The error of the winner of every fold gives an unbiased
+    estimate of the error of the whole search.
+
+    Args:
+        vectors (gensim.models.keyedvectors.KeyedVectors): The word vectors model.
+        dims: dict of dimensions, each containing "left" and "right" keys with word lists.
+        test_words: dict of test words with labels indicating political sensitivity (1) or neutrality (0).
+        n_random (int, optional): The number of random pole word subsets. Defaults to 5000.
+        subset_size (int, optional): The number of words per pole in a random subset. Defaults to 5.
+        greedy_size (int, optional): The maximum number of pole words chosen greedily. Defaults to 10.
+        n_components (int, optional): The number of principal components used as candidates. Defaults to 3.
+        n_folds (int, optional): The number of cross-validation folds. Defaults to 5. It is reduced to the number of
+            words of the smaller label, so that every fold contains sensitive and neutral words.
+        n_selected (int, optional): The number of candidates selected on the training words of every fold. Defaults to 10.
+        seed (int, optional): Seed of the random number generator. Defaults to 0.
+
+    Returns:
+        tuple: The candidate definitions sorted by their error on all labelled words (ascending) and the nested
+        cross-validation error of the search. Every definition contains a "name", an "error", a "cv_error"
+        (the mean held-out error in the folds it was selected in, or None) and either "left" and "right" word lists
+        or an "axis" vector.
+
+    Raises:
+        ValueError: If fewer than two sensitive or two neutral test words are found in the dataset.
+    """
+    rng = np.random.default_rng(seed)
+    found_words = [word for word in test_words if word in vectors.key_to_index]
+    word_vectors = unit_rows(np.array([vectors[word] for word in found_words]))
+    labels = np.array([1 if test_words[word] == 1 else 0 for word in found_words])
+    # Every training and held-out fold needs words of both labels
+    words_per_label = min(np.sum(labels == 0), np.sum(labels == 1))
+    if words_per_label < 2:
+        raise ValueError(f"The axis search needs at least two sensitive and two neutral test words in the dataset, found {words_per_label} of one label")
+    n_folds = min(n_folds, int(words_per_label))
+
+    random_definitions, random_axes = random_subset_axes(vectors, dims, n_random, subset_size, rng)
+    combination_definitions, combination_axes = dimension_combination_axes(vectors, dims)
+    fixed_axes = np.vstack([random_axes, combination_axes])
+
+    # Stratified folds, so that every fold contains sensitive and neutral words
+    folds = [[] for _ in range(n_folds)]
+    for label in (0, 1):
+        for fold, indices in zip(folds, np.array_split(rng.permutation(np.flatnonzero(labels == label)), n_folds)):
+            fold.extend(indices)
+
+    n_candidates = len(fixed_axes) + (greedy_size - 1) + (n_components + 1)
+    held_out_errors = np.zeros(n_candidates)
+    held_out_words = np.zeros(n_candidates)
+    nested_error = 0
+    for fold in folds:
+        test = np.zeros(len(labels), dtype=bool)
+        test[fold] = True
+        _, greedy_axes = greedy_pole_axes(vectors, dims, word_vectors[~test], labels[~test], greedy_size)
+        _, direction_axes = label_direction_axes(word_vectors[~test], labels[~test], n_components)
+        axes = np.vstack([fixed_axes, greedy_axes, direction_axes])
+
+        # Select on the training words only, evaluate the selected candidates on the held-out words
+        selected = np.argsort(score_axes(axes, word_vectors[~test], labels[~test]))[:n_selected]
+        test_errors = score_axes(axes[selected], word_vectors[test], labels[test])
+        held_out_errors[selected] += test_errors * test.sum()
+        held_out_words[selected] += test.sum()
+        nested_error += test_errors[0] * test.sum()
+
+    # Refit the label dependent candidates on all labelled words
+    greedy_definitions, greedy_axes = greedy_pole_axes(vectors, dims, word_vectors, labels, greedy_size)
+    direction_definitions, direction_axes = label_direction_axes(word_vectors, labels, n_components)
+
+    definitions = random_definitions + combination_definitions + greedy_definitions + direction_definitions
+    errors = score_axes(np.vstack([fixed_axes, greedy_axes, direction_axes]), word_vectors, labels)
+    for i, definition in enumerate(definitions):
+        definition["error"] = float(errors[i])
+        definition["cv_error"] = float(held_out_errors[i] / held_out_words[i]) if held_out_words[i] else None
+
+    return sorted(definitions, key=lambda definition: definition["error"]), float(nested_error / len(labels))
+
+
+def find_best_dataset_axis(datasets, dims, test_words, top_n=10, **search_kwargs):
+    """
+    Runs the candidate axis search (see search_axes) for every dataset and identifies the best dataset-axis combination,
+    i.e. the dataset with the lowest nested cross-validation error and its best axis.
+
+    Args:
+        datasets: list of dataset objects for evaluation.
+        dims: dict of dimensions, each containing "left" and "right" keys with word lists.
+        test_words: dict of test words with labels indicating political sensitivity (1) or neutrality (0).
+        top_n (int, optional): The number of best candidates printed per dataset. Defaults to 10.
+        **search_kwargs: Further arguments passed on to search_axes.
+
+    Returns:
+        A tuple containing the name of the best dataset and the definition of the best axis, including its "nested_cv_error".
+        Axes stored as vectors additionally contain the "dataset", its "vector_size" and "vocab_size", as they are
+        only valid for this dataset.
+    """
+    best_dataset = None
+    best_axis = None
+
+    for dataset in datasets:
+        vectors = dataset.wv if hasattr(dataset, 'wv') else dataset
+        ranking, nested_cv_error = search_axes(vectors, dims, test_words, **search_kwargs)
+
+        print(f"Best axes of the dataset {str(dataset)} out of {len(ranking)} candidates (nested cross-validation error {nested_cv_error:.4f}):")
+        for definition in ranking[:top_n]:
+            cv_error = f"{definition['cv_error']:.4f}" if definition['cv_error'] is not None else "not selected"
+            print(f"    {definition['name']}: {definition['error']:.4f} (held-out: {cv_error})")
+
+        if best_axis is None or nested_cv_error < best_axis["nested_cv_error"]:
+            best_dataset = str(dataset)
+            best_axis = dict(ranking[0], nested_cv_error=nested_cv_error)
+            if "axis" in best_axis:
+                best_axis.update(dataset=str(dataset), vector_size=vectors.vector_size, vocab_size=len(vectors.index_to_key))
+
+    return best_dataset, best_axis
+
 def load_embeddings(models_dir="models"):
     """
     Loads and returns a list of word embedding models from a specified directory.
@@ -188,7 +453,20 @@ def write_best_dimension_to_json(best_dim, dims):
     
     print(f"Contents of the best dimension '{best_dim}' were written to {filename}")
 
-def main():
+def write_best_axis_to_json(best_axis):
+    """
+        Saves the best axis found by search_axes to a json file so it can be used later on by informative_dimension_approach.py.
+        Axes built from pole words are stored with their "left" and "right" words, all other axes with their "axis" vector
+        and the dataset, vector size and vocabulary size they were found on.
+    """
+    filename = 'util/best_dimension.json'
+
+    with open(filename, 'w') as f:
+        json.dump({key: value for key, value in best_axis.items() if key not in ("error", "cv_error", "nested_cv_error")}, f, indent=4)
+
+    print(f"Contents of the best axis '{best_axis['name']}' were written to {filename}")
+
+def main(run_axis_search=SEARCH_AXES):
     """
     Main function to identify the best dataset and dimension pair.
 
@@ -196,6 +474,7 @@ def main():
     2. Defining set of potential political dimensions
     3. Loading set of test words
     4. Finding the best dataset and dimension combination that minimizes the error
+       (or, if run_axis_search is True, the best dataset and axis out of thousands of generated candidates)
     5. Writing best dimension's data to a JSON file
     6. Printing best dataset-dimension pair
     """
@@ -205,6 +484,12 @@ def main():
     
     test_words = load_words()
 
+    if run_axis_search:
+        best_dataset, best_axis = find_best_dataset_axis(datasets, dims, test_words)
+        write_best_axis_to_json(best_axis)
+        print(f"The dataset-axis pair with the lowest nested cross-validation error on the test words is {best_dataset} with the {best_axis['name']} axis, with an error of {best_axis['nested_cv_error']}")
+        return
+
     best_dataset, best_dim, error = find_best_dataset_dim(datasets, dims, test_words)
 
     write_best_dimension_to_json(best_dim, dims)
@@ -47,7 +47,7 @@ def load_data_and_prepare_requests(file_path, batchsize, timestamp_start, n_call
 
     return requests
 
-def send_request(client, request, prompt, model):
+def send_request(client, request, prompt, model, response_format=None):
     """
     Sends requests to the OpenAI API and writes responses to a file.
     
@@ -56,11 +56,13 @@ def send_request(client, request, prompt, model):
         requests (list of str): The list of prepared requests.
         prompt (str): The system prompt to use for the requests.
         model (str): specifies which OpenAI model to use for the requests.
-        file_name (str): The name of the file to write the responses to.
+        response_format (dict, optional): The response format passed to the API, e.g. {"type": "json_object"}.
 
     Returns:
         int: The total number of tokens used by the requests.
     """
+    # Only pass the response format if one is requested, so the default calls stay unchanged
+    kwargs = {"response_format": response_format} if response_format else {}
     pre_chat = time.time()
     completion = client.chat.completions.create(
         model=model,
@@ -69,6 +71,7 @@ def send_request(client, request, prompt, model):
             {"role": "user", "content": f"{request}"},
         ],
         temperature=0.1,
+        **kwargs,
     )
 
     post_chat = time.time()
@@ -86,6 +89,22 @@ def write_response(content, file_name, post_chat):
     construct = '[' + str(content).split('[', 1)[1]
     parts = construct.split(']')
     json_str = ']'.join(parts[:-1]) + ']'
+    # call json_str as json object
+    new_data = json.loads(json_str)
+    append_to_json_file(new_data, file_name)
+
+    post_write = time.time()
+    print("postwrite: " + str(post_write - post_chat))
+    return None
+
+def append_to_json_file(new_data, file_name):
+    """
+    Appends a list of word descriptions to the list stored in a JSON file.
+
+    Args:
+        new_data (list of dict): The word descriptions to append.
+        file_name: The file to which the descriptions should be written. It is created if it does not exist.
+    """
     try:
         with open(file_name, 'r') as file:
             # First we load existing data into a dict.
@@ -93,8 +112,6 @@ def write_response(content, file_name, post_chat):
     except FileNotFoundError:
         # If the file doesn't exist, we'll create a new list.
         file_data = []
-    # call json_str as json object
-    new_data = json.loads(json_str)
     # Join new_data with file_data
     file_data.extend(new_data)
     # Write the updated data to the file.
@@ -102,11 +119,96 @@ def write_response(content, file_name, post_chat):
         # convert back to json.
         json.dump(file_data, file, indent=4)
 
+def validate_bilingual_response(content, words):
+    """
+    Parses a bilingual API response and validates it against the structure requested in util/bilingual_prompt.txt:
+    {"descriptions": [{"word", "sensitivity_rating", "english": {"definition", "translation_options"}, "german": {...}}]},
+    where "translation_options" is a list of {"option", "nuance"} entries.
+
+    Args:
+        content (str): The content of the API response.
+        words (list of str): The words that were sent with the request.
+
+    Returns:
+        list of dict: The validated word descriptions.
+
+    Raises:
+        ValueError: If the response is not valid JSON or does not match the expected structure.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not valid JSON: {e}")
+
+    if not isinstance(data, dict) or not isinstance(data.get("descriptions"), list):
+        raise ValueError('Response must be an object with a "descriptions" list')
+
+    for entry in data["descriptions"]:
+        if not isinstance(entry, dict) or entry.get("word") not in words:
+            raise ValueError(f"Unexpected entry in response: {entry}")
+        rating = entry.get("sensitivity_rating")
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 0 <= rating <= 1:
+            raise ValueError(f"Invalid sensitivity_rating for '{entry['word']}': {rating}")
+        for language in ("english", "german"):
+            description = entry.get(language)
+            if not isinstance(description, dict) or not isinstance(description.get("definition"), str):
+                raise ValueError(f"Missing {language} definition for '{entry['word']}'")
+            options = description.get("translation_options")
+            if not isinstance(options, list) or not all(
+                    isinstance(option, dict) and isinstance(option.get("option"), str) and isinstance(option.get("nuance"), str)
+                    for option in options):
+                raise ValueError(f"Invalid {language} translation_options for '{entry['word']}'")
+
+    missing_words = set(words) - {entry["word"] for entry in data["descriptions"]}
+    if missing_words:
+        raise ValueError(f"Response is missing the words: {', '.join(sorted(missing_words))}")
+
+    return data["descriptions"]
+
+def write_bilingual_response(content, words, file_names, post_chat):
+    """
+    Validates a bilingual API response and splits it into one description per language,
+    in the same format as the single language outputs.
+
+    Args:
+        content (str): The content of the API response.
+        words (list of str): The words that were sent with the request.
+        file_names (dict): The output file for each language, with the keys "english" and "german".
+    """
+    descriptions = validate_bilingual_response(content, words)
+    for language, file_name in file_names.items():
+        new_data = [
+            {
+                "word": entry["word"],
+                "sensitivity_rating": entry["sensitivity_rating"],
+                "definition": entry[language]["definition"],
+                "translation_options": entry[language]["translation_options"],
+            }
+            for entry in descriptions
+        ]
+        append_to_json_file(new_data, file_name)
+
     post_write = time.time()
     print("postwrite: " + str(post_write - post_chat))
     return None
         
 
+def load_system_prompt(output_language, input_language):
+    """
+    Reads the system prompt for the given output language from the util/ directory.
+
+    Args:
+        output_language (str): 'english', 'german' or 'bilingual'.
+        input_language (str): The language of the words, filled into the {INPUT_LANGUAGE} placeholder of the prompt.
+
+    Returns:
+        str: The system prompt.
+    """
+    # Change the prompt files if you want to do experiments
+    prompt_files = {'english': 'util/english_prompt.txt', 'german': 'util/german_prompt.txt', 'bilingual': 'util/bilingual_prompt.txt'}
+    with open(prompt_files[output_language], 'r', encoding='utf-8') as file:
+        return file.read().replace('{INPUT_LANGUAGE}', input_language)
+
 def gpt_api_calls():
     """
     Executes the GPT API calls for generating definitions and possible translation options to a list of sensitive terms.
@@ -127,8 +229,8 @@ def gpt_api_calls():
     N_CALLS = 2 # Number of calls to the API (each call will contain BATCHSIZE words)
     START_INDEX = 160 # Index of the first word to be processed (csv file line number of the word - 2)
 
-    OUTPUT_LANGUAGE = 'english' # 'german' or 'english'
-    INPUT_LANGUAGE = 'English' if OUTPUT_LANGUAGE == 'english' else 'englisch' # or 'German' if OUTPUT_LANGUAGE == 'german' else 'deutsch'
+    OUTPUT_LANGUAGE = 'english' # 'german', 'english' or 'bilingual' (English and German descriptions in one call per batch)
+    INPUT_LANGUAGE = 'englisch' if OUTPUT_LANGUAGE == 'german' else 'English' # or 'deutsch' if OUTPUT_LANGUAGE == 'german' else 'German'
     
     # Adjust only if needed
     BATCHSIZE = 5 # Number of words per call to the API (5 turned out to be a working number for the current model and token limits)
@@ -137,6 +239,7 @@ def gpt_api_calls():
 
     data_file_name = 'output/joined_sensitive_words.csv'
     output_file_name = 'output/gpt_descriptions_german.json' if OUTPUT_LANGUAGE == 'german' else 'output/gpt_descriptions_english.json'
+    bilingual_file_names = {'english': 'output/gpt_descriptions_english.json', 'german': 'output/gpt_descriptions_german.json'}
 
 
     ### Start of the function ###
@@ -147,11 +250,7 @@ def gpt_api_calls():
     api_key = read_api_key(API_KEY_FILE)
     client = OpenAI(api_key=api_key)
 
-    # Change the prompt file if you want to do experiments
-    # read the system prompt from the file english_prompt.txt
-    sys_prompt_english = open('output/english_prompt.txt', 'r').read()
-    sys_prompt_german = open('output/german_prompt.txt', 'r').read()
-    sys_prompt = sys_prompt_english if OUTPUT_LANGUAGE == 'english' else sys_prompt_german
+    sys_prompt = load_system_prompt(OUTPUT_LANGUAGE, INPUT_LANGUAGE)
     
 
     # Load the data and prepare requests for the API
@@ -160,8 +259,17 @@ def gpt_api_calls():
     total_tokens = 0
     # Send requests to the OpenAI API and write responses to a file
     for request in requests:
-        content, toks, post_chat = send_request(client, requests, sys_prompt, MODEL)
-        write_response(content, output_file_name, post_chat)
+        if OUTPUT_LANGUAGE == 'bilingual':
+            # One structured response per batch that is split into the English and German output files
+            content, toks, post_chat = send_request(client, request, sys_prompt, MODEL, response_format={"type": "json_object"})
+            words = [word.removeprefix("word: ") for word, _ in request]
+            try:
+                write_bilingual_response(content, words, bilingual_file_names, post_chat)
+            except ValueError as e:
+                print(f"Skipping invalid response for the words {words}: {e}")
+        else:
+            content, toks, post_chat = send_request(client, request, sys_prompt, MODEL)
+            write_response(content, output_file_name, post_chat)
         total_tokens += toks
 
     print(f"Total tokens used: {total_tokens}")
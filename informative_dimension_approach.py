@@ -1,18 +1,23 @@
 from dimension_evaluation import project_word_on_vec, create_vec_axis
+from sharded_search import ShardedKeyedVectors
 import os
 import pickle
 from gensim.models import KeyedVectors 
 import json
 import pandas as pd
+import numpy as np
 
-def calculate_political_sensitivity(dataset, dimension, sensitive_word):
+def calculate_political_sensitivity(dataset, dimension, sensitive_word, most_similar_words=None):
     """
     Calculates and ranks the political sensitivity of words similar to a given sensitive word.
     
     Args:
-        dataset: gensim.models.keyedvectors.KeyedVectors, the dataset containing word vectors.
-        dimension: dict, with "positive" and "negative" keys and lists of words as values defining a political axis.
+        dataset: gensim.models.keyedvectors.KeyedVectors or ShardedKeyedVectors, the dataset containing word vectors.
+        dimension: dict, with "left" and "right" keys and lists of words as values defining a political axis,
+            or with an "axis" key holding the axis vector.
         sensitive_word: str, the politically sensitive word to analyze.
+        most_similar_words: list of (word, similarity) tuples, optional. Precomputed neighbours of the sensitive word,
+            e.g. from ShardedKeyedVectors.most_similar_batch. If None, they are computed with most_similar.
         
     Returns:
         A list of the top 10 words most similar in political sensitivity to the given word.
@@ -24,12 +29,17 @@ def calculate_political_sensitivity(dataset, dimension, sensitive_word):
         print(f"The word {sensitive_word} is not in the dataset.")
         return []
     
-    # Create the political axis
-    axis = create_vec_axis(dataset, dimension["left"], dimension["right"])
+    # Create the political axis (axes found by the axis search in dimension_evaluation.py may be stored as a vector)
+    if "axis" in dimension:
+        check_axis_matches_dataset(dimension, dataset)
+        axis = np.array(dimension["axis"])
+    else:
+        axis = create_vec_axis(dataset, dimension["left"], dimension["right"])
 
     
     # Find the 50 most similar words to the sensitive word
-    most_similar_words = dataset.most_similar(sensitive_word, topn=50)
+    if most_similar_words is None:
+        most_similar_words = dataset.most_similar(sensitive_word, topn=50)
     
     # Project each similar word onto the political axis 
     word_projections = []
@@ -45,6 +55,24 @@ def calculate_political_sensitivity(dataset, dimension, sensitive_word):
     # Return the top 10 words
     return word_projections[:10]
 
+def check_axis_matches_dataset(dimension, dataset):
+    """
+    Checks that an axis stored as a vector was found on the given dataset. Such an axis is only meaningful in the
+    embedding space it was computed in, so its vector size and the vocabulary size of its dataset have to match.
+
+    Args:
+        dimension: dict with an "axis" vector and the "dataset", "vector_size" and "vocab_size" it was found on.
+        dataset: gensim.models.keyedvectors.KeyedVectors or ShardedKeyedVectors, the dataset the axis is applied to.
+
+    Raises:
+        ValueError: If the axis was found on a different dataset.
+    """
+    vector_size = len(dataset[dataset.index_to_key[0]])
+    if dimension.get("vector_size") != vector_size or len(dimension["axis"]) != vector_size or dimension.get("vocab_size") != len(dataset.index_to_key):
+        raise ValueError(f"The axis '{dimension.get('name')}' was found on the dataset {dimension.get('dataset')} and can not be applied to a dataset "
+                         f"with {len(dataset.index_to_key)} words of size {vector_size}. Rerun the axis search on this dataset "
+                         f"or use a dimension defined by \"left\" and \"right\" words.")
+
 def load_embeddings(name, models_dir="models"):
     """
     Loads a word embeddings model from a specified directory.
@@ -141,12 +169,13 @@ def load_sensitive_terms(json_file, model):
 
     return found_words, missing_words
 
-def sensitive_dimension_approach():
+def sensitive_dimension_approach(shard_dir=None, model=None, path_to_output=os.path.join('output', 'output_dimension_approach.csv')):
     """
     Executes the sensitive dimension approach for analyzing political sensitivity of words.
 
     This function performs the following steps:
-    1. Load pretrained word embeddings from a specified model file.
+    1. Load pretrained word embeddings from a specified model file, or from a partitioned vocabulary
+       if shard_dir is given (see sharded_search.py). Word vectors that are already loaded can be passed as model.
     2. Load the best political dimension from a JSON file.
     3. Load and process a list of sensitive terms, identifying words missing in the model.
     4. Analyze each term for political sensitivity based on the loaded dimension and embeddings, 
@@ -156,10 +185,14 @@ def sensitive_dimension_approach():
 
     The output of this function is a CSV file, containing words similar to the input sensitive terms,
     their computed sensitivity scores, and the corresponding input term. It also prints the DataFrame format of the results.
+
+    Returns:
+        pd.DataFrame: The similar words with their sensitivity score and input word, as written to path_to_output.
     """
         
     # Load pretrained word embeddings
-    model = load_embeddings("embeddings_cache/word2vec_test.model")
+    if model is None:
+        model = ShardedKeyedVectors(shard_dir) if shard_dir else load_embeddings("embeddings_cache/word2vec_test.model")
 
     # Define political dimension
     dim = load_dimension_from_json("util/best_dimension.json")
@@ -167,10 +200,13 @@ def sensitive_dimension_approach():
     # Define words to analyze
     sensitive_terms, words_missing_in_model = load_sensitive_terms("util/macht.sprache_words.json", model)
 
+    # Partitioned models search the neighbours of all terms in one parallel pass
+    batch_results = model.most_similar_batch(sensitive_terms, topn=50) if hasattr(model, "most_similar_batch") else {}
+
     global_similar_words = {}
 
     for term in sensitive_terms:
-        results = calculate_political_sensitivity(model, dim, term)
+        results = calculate_political_sensitivity(model, dim, term, batch_results.get(term))
         for similar_word, sensitivity_score in results:
             if similar_word not in global_similar_words or sensitivity_score > global_similar_words[similar_word]['score']:
                 global_similar_words[similar_word] = {'score': sensitivity_score, 'input_word': term}
@@ -185,9 +221,14 @@ def sensitive_dimension_approach():
     df = pd.DataFrame(entries, columns=["similar_word", "sensitivity_score", "input_word"])
 
     # Save DataFrame to CSV
-    df.to_csv('output/output_dimension_approach.csv', index=False)
+    df.to_csv(path_to_output, index=False)
+
+    if shard_dir:
+        model.close()
  
     print(f"format of results: {df}")
 
+    return df
+
 if __name__ == "__main__":
     sensitive_dimension_approach()
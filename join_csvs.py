@@ -20,6 +20,23 @@ def joined_sensitive_word_csvs():
     df1 = pd.read_csv('output/output_buzzwords_approach.csv')
     df2 = pd.read_csv('output/output_dimension_approach.csv')
 
+    df = join_sensitive_words(df1, df2)
+
+    # Save processed data to CSV
+    df.to_csv('output/joined_sensitive_words.csv', index=False)
+
+
+def join_sensitive_words(df1, df2):
+    """
+    Normalizes the sensitivity scores of the outputs of both approaches and combines them into one ranking.
+
+    Args:
+        df1 (pd.DataFrame): Output of the buzzwords approach with the columns similar_word, sensitivity_score and input_word.
+        df2 (pd.DataFrame): Output of the dimension approach with the same columns.
+
+    Returns:
+        pd.DataFrame: The joined words with the columns similar_word, input_word and sensitivity_score, sorted by sensitivity_score.
+    """
     # Normalize sensitivity score (0-1 range)
     df1['sensitivity_score'] = (df1['sensitivity_score'] - df1['sensitivity_score'].min()) / (df1['sensitivity_score'].max() - df1['sensitivity_score'].min())
     df2['sensitivity_score'] = (df2['sensitivity_score'] - df2['sensitivity_score'].min()) / (df2['sensitivity_score'].max() - df2['sensitivity_score'].min())
@@ -33,8 +50,7 @@ def joined_sensitive_word_csvs():
     # Sort by sensitivity score (descending)
     df = df.sort_values('sensitivity_score', ascending=False).reset_index(drop=True)
 
-    # Save processed data to CSV
-    df.to_csv('output/joined_sensitive_words.csv', index=False)
+    return df
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+import pandas as pd
+import numpy as np
+import itertools
+import json
+import os
+from sensitive_buzzwords_approach import load_model_and_data
+
+
+def compute_neighbours(w2v, input_words, max_similar_words):
+    """
+    Computes the neighbour lists of all input words once, for the largest number of similar words in the sweep.
+    Every smaller setting of nr_similar_words is a prefix of these lists, as most_similar returns the neighbours
+    sorted by descending similarity.
+
+    Args:
+        w2v (gensim.models.Word2Vec or ShardedKeyedVectors): Word2Vec model.
+        input_words (pd.Series): Input words.
+        max_similar_words (int): Largest number of similar words to retrieve.
+
+    Returns:
+        pd.DataFrame: One row per input word and neighbour with the columns input_word, similar_word, rank and similarity.
+    """
+    batch_results = w2v.most_similar_batch(input_words, topn=max_similar_words) if hasattr(w2v, "most_similar_batch") else None
+
+    rows = []
+    for input_word in input_words.drop_duplicates():
+        try:
+            most_similar_words = batch_results[input_word] if batch_results is not None else w2v.most_similar(input_word, topn=max_similar_words)
+        except KeyError:
+            continue # input words that could not be found in the lexicon
+        rows.extend((input_word, similar_word, rank, similarity) for rank, (similar_word, similarity) in enumerate(most_similar_words))
+
+    return pd.DataFrame(rows, columns=['input_word', 'similar_word', 'rank', 'similarity'])
+
+
+def calculate_sensitivity_scores(w2v, words, buzzwords):
+    """
+    Calculates the sensitivity score of every word in one matrix operation.
+    The score is the same as in filter_for_sensitivity: the mean cosine similarity to the buzzwords, rounded to 3 decimals.
+
+    Args:
+        w2v (gensim.models.Word2Vec or ShardedKeyedVectors): Word2Vec model.
+        words (list of str): The words to be scored.
+        buzzwords (list): List of social justice buzzwords.
+
+    Returns:
+        np.ndarray: The sensitivity score of every word.
+    """
+    word_vectors = np.array([w2v[word] for word in words])
+    buzzword_vectors = np.array([w2v[buzzword] for buzzword in buzzwords])
+    word_vectors = word_vectors / np.linalg.norm(word_vectors, axis=1, keepdims=True)
+    buzzword_vectors = buzzword_vectors / np.linalg.norm(buzzword_vectors, axis=1, keepdims=True)
+    return np.round((word_vectors @ buzzword_vectors.T).mean(axis=1), 3)
+
+
+def load_reference_words(path_to_reference, language):
+    """
+    Loads the labelled reference words the outputs of the sweep are compared to.
+    Supported are CSV files with a "similar_word" column (e.g. a reviewed output file) and JSON files
+    in the macht.sprache format with a "lemma" key. JSON entries with a "lemma_lang" are filtered by the language.
+
+    Returns:
+        set: The reference words.
+    """
+    if path_to_reference.endswith(".csv"):
+        return set(pd.read_csv(path_to_reference)['similar_word'])
+
+    with open(path_to_reference, 'r', encoding='utf-8') as file:
+        return {entry.get('lemma', '') for entry in json.load(file) if entry.get('lemma_lang', language) == language}
+
+
+def parameter_sweep(nr_similar_words_grid=(10, 20, 30, 40, 50, 75, 100),
+    similarity_threshold_grid=np.arange(0.4, 0.85, 0.05),
+    sensitivity_threshold_grid=np.arange(0.2, 0.65, 0.05),
+    language='en', buzzwords=['discrimination', 'political'],
+    path_to_model=os.path.join('models', 'word2vec_test.model'),
+    path_to_input_words=os.path.join('macht.sprache_input', 'macht.sprache_words.json'),
+    path_to_reference=None,
+    shard_dir=None):
+    """
+    Evaluates every combination of nr_similar_words, similarity_threshold and sensitivity_threshold of the
+    buzzwords approach in a single run. The neighbour lists and sensitivity scores are computed once for the
+    largest nr_similar_words. The output of every setting is then derived by slicing the neighbour lists and
+    masking them with the thresholds, which gives the same words as a full run of sensitive_buzzwords_approach.
+
+    For every setting the number of output words is reported. If a labelled reference file is given
+    (path_to_reference, see load_reference_words), the overlap with it, precision and recall are reported as well;
+    otherwise these columns are empty.
+
+    Returns:
+        pd.DataFrame: One row per setting with the columns nr_similar_words, similarity_threshold,
+        sensitivity_threshold, output_size, reference_overlap, precision and recall.
+    """
+    # Load the pretrained model and the terms from macht.sprache
+    w2v, input_words = load_model_and_data(path_to_model, path_to_input_words, language, shard_dir)
+    reference_words = load_reference_words(path_to_reference, language) if path_to_reference else None
+
+    # Compute the neighbour lists and sensitivity scores once, for the largest setting
+    neighbours = compute_neighbours(w2v, input_words, max(nr_similar_words_grid))
+    words, word_ids = np.unique(neighbours['similar_word'].to_numpy(dtype=str), return_inverse=True)
+    scores = calculate_sensitivity_scores(w2v, words, buzzwords)[word_ids]
+    in_reference = np.isin(words, list(reference_words or []))
+
+    if shard_dir:
+        w2v.close()
+
+    ranks = neighbours['rank'].to_numpy()
+    similarities = neighbours['similarity'].to_numpy()
+
+    results = []
+    for nr_similar_words, similarity_threshold, sensitivity_threshold in itertools.product(
+            nr_similar_words_grid, similarity_threshold_grid, sensitivity_threshold_grid):
+        similarity_threshold, sensitivity_threshold = round(float(similarity_threshold), 3), round(float(sensitivity_threshold), 3)
+        mask = (ranks < nr_similar_words) & (similarities > similarity_threshold) & (scores > sensitivity_threshold)
+        output_ids = np.unique(word_ids[mask])
+        if reference_words is None:
+            results.append([nr_similar_words, similarity_threshold, sensitivity_threshold, len(output_ids), np.nan, np.nan, np.nan])
+            continue
+        overlap = int(in_reference[output_ids].sum())
+        results.append([nr_similar_words, similarity_threshold, sensitivity_threshold, len(output_ids), overlap,
+                        overlap / len(output_ids) if len(output_ids) else 0.0,
+                        overlap / len(reference_words) if reference_words else 0.0])
+
+    sweep_df = pd.DataFrame(results, columns=['nr_similar_words', 'similarity_threshold', 'sensitivity_threshold',
+                                              'output_size', 'reference_overlap', 'precision', 'recall'])
+    sweep_df.to_csv("output/parameter_sweep.csv", index=False)
+
+    return sweep_df
+
+
+if __name__ == "__main__":
+    print(parameter_sweep())
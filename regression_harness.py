@@ -0,0 +1,208 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import shutil
+import tempfile
+import tracemalloc
+from gensim.models import KeyedVectors
+from sensitive_buzzwords_approach import sensitive_buzzwords_approach, load_model_and_data, load_input_words
+from informative_dimension_approach import sensitive_dimension_approach
+from join_csvs import join_sensitive_words
+from sharded_search import write_vocabulary_shards, ShardedKeyedVectors
+
+
+def quantised_vectors(w2v, dtype=np.float16):
+    """
+    Creates a copy of the word vectors with reduced precision, e.g. float16, which halves the memory of the matrix.
+
+    Returns:
+        gensim.models.keyedvectors.KeyedVectors: The quantised word vectors.
+    """
+    quantised = KeyedVectors(w2v.vector_size, count=0, dtype=dtype)
+    quantised.add_vectors(w2v.index_to_key, np.asarray(w2v.vectors, dtype=dtype))
+    return quantised
+
+
+def sharded_vectors(w2v, n_shards=4):
+    """
+    Writes the word vectors as partitions to a temporary directory and opens them with ShardedKeyedVectors.
+
+    Returns:
+        ShardedKeyedVectors: The partitioned word vectors.
+    """
+    vectors = ShardedKeyedVectors(write_vocabulary_shards(w2v, tempfile.mkdtemp(prefix="shards_"), n_shards=n_shards))
+    vectors.temporary = True # the partitions are deleted after the comparison
+    return vectors
+
+
+def default_modes():
+    """
+    Returns the alternative modes compared to the exact pipeline. Every mode is a function that builds
+    a replacement for the exact word vectors; further modes (e.g. approximate indexes) can be added with
+    any object that offers most_similar, similarity, key_to_index and item access.
+    """
+    return {
+        "sharded": sharded_vectors,
+        "float16": quantised_vectors,
+    }
+
+
+def in_memory_size_mb(vectors):
+    """
+    Returns the size of the vector matrix that is held in RAM in MB. Memory mapped matrices (e.g. the partitions
+    of ShardedKeyedVectors or models loaded with mmap='r') are read from disk on demand and are not counted.
+    """
+    matrix = getattr(vectors, "vectors", None)
+    if matrix is None or isinstance(matrix, np.memmap):
+        return 0.0
+    return matrix.nbytes / 2**20
+
+
+def run_pipeline(load_vectors, path_to_input_words, language, nr_similar_words, similarity_threshold, buzzwords, sensitivity_threshold, output_dir):
+    """
+    Runs the sequential pipeline (sensitive_buzzwords_approach, sensitive_dimension_approach and join_sensitive_words)
+    on the given word vectors and measures it. All outputs are written to output_dir instead of output/ and util/.
+
+    Loading or building the word vectors happens inside the measured region, so the peak memory includes the memory
+    of the vectors themselves. The neighbour lists for recall@k are computed once in a separate, timed pass (with the
+    batched search where the vectors offer it); pipeline_seconds only covers the pipeline itself.
+
+    Args:
+        load_vectors (callable): Function without arguments that loads or builds the word vectors.
+        output_dir (str): The directory the output files are written to.
+
+    Returns:
+        dict: The neighbour lists of all input words ("neighbours"), the three output DataFrames ("buzzwords", "dimension",
+        "joined"), the time needed to load the vectors, for the neighbour search and for the pipeline in seconds, the size
+        of the vector matrix held in RAM and the peak memory allocated in this process in MB (memory of worker processes
+        and memory mapped files is not included).
+    """
+    tracemalloc.start()
+    start = time.time()
+    vectors = load_vectors()
+    load_seconds = time.time() - start
+
+    start = time.time()
+    input_words = load_input_words(path_to_input_words, language)
+    if hasattr(vectors, "most_similar_batch"):
+        batch_results = vectors.most_similar_batch(input_words, topn=nr_similar_words)
+    else:
+        batch_results = {}
+        for input_word in input_words:
+            try:
+                batch_results[input_word] = vectors.most_similar(input_word, topn=nr_similar_words)
+            except KeyError:
+                continue
+    neighbours = {input_word: [word for word, _ in most_similar_words] for input_word, most_similar_words in batch_results.items()}
+    neighbour_seconds = time.time() - start
+
+    start = time.time()
+    path_to_buzzwords = os.path.join(output_dir, 'output_buzzwords_approach.csv')
+    path_to_dimension = os.path.join(output_dir, 'output_dimension_approach.csv')
+    sensitive_buzzwords_approach(nr_similar_words, similarity_threshold, sensitivity_threshold, language, buzzwords,
+                                 path_to_input_words=path_to_input_words, w2v=vectors, path_to_output=path_to_buzzwords,
+                                 path_to_similarity_values=os.path.join(output_dir, 'similar_words_with_similarity_value'))
+    sensitive_dimension_approach(model=vectors, path_to_output=path_to_dimension)
+    # Join the outputs as written to disk, as join_csvs does
+    buzzwords_df, dimension_df = pd.read_csv(path_to_buzzwords), pd.read_csv(path_to_dimension)
+    joined_df = join_sensitive_words(buzzwords_df.copy(), dimension_df.copy())
+    joined_df.to_csv(os.path.join(output_dir, 'joined_sensitive_words.csv'), index=False)
+    pipeline_seconds = time.time() - start
+
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"vectors": vectors, "neighbours": neighbours, "buzzwords": buzzwords_df, "dimension": dimension_df, "joined": joined_df,
+            "load_seconds": load_seconds, "neighbour_seconds": neighbour_seconds, "pipeline_seconds": pipeline_seconds,
+            "model_mb": in_memory_size_mb(vectors), "peak_memory_mb": peak_memory / 2**20}
+
+
+def recall_at_k(exact_neighbours, neighbours):
+    """
+    Calculates the mean share of the exact top-k neighbours that are also found by an alternative mode.
+    """
+    recalls = [len(set(exact) & set(neighbours.get(word, []))) / len(exact) for word, exact in exact_neighbours.items() if exact]
+    return float(np.mean(recalls)) if recalls else np.nan
+
+
+def rank_correlation(exact_df, df):
+    """
+    Calculates the Spearman rank correlation of the sensitivity scores of the words contained in both outputs.
+    """
+    scores = exact_df.set_index('similar_word')['sensitivity_score'].to_frame('exact').join(
+        df.set_index('similar_word')['sensitivity_score'].to_frame('mode'), how='inner')
+    return scores['exact'].corr(scores['mode'], method='spearman') if len(scores) > 1 else np.nan
+
+
+def regression_harness(modes=None, nr_similar_words=50, similarity_threshold=0.6, sensitivity_threshold=0.4,
+    language='en', buzzwords=['discrimination', 'political'],
+    path_to_model=os.path.join('models', 'word2vec_test.model'),
+    path_to_input_words=os.path.join('macht.sprache_input', 'macht.sprache_words.json')):
+    """
+    Compares faster or more compact modes of the pipeline against the exact pipeline on the same inputs.
+
+    The sequential pipeline on the model at path_to_model serves as ground truth (the dimension approach is given
+    the same model, as it otherwise loads its own). Every mode runs the same sequential pipeline on its replacement
+    vectors. For every mode, the following is reported next to its latency and memory:
+    - recall@k of the neighbour lists of the input words (k = nr_similar_words)
+    - Spearman rank correlation of the sensitivity scores of both approaches and of the joined ranking
+    - the words of joined_sensitive_words.csv that are only found by the exact pipeline or only by the mode
+
+    The outputs of the runs are written to temporary directories, the report to output/regression_report.csv and
+    the differing words to output/regression_differences.csv.
+
+    Args:
+        modes (dict, optional): Maps mode names to functions that build the replacement word vectors from the exact ones.
+            Defaults to default_modes().
+
+    Returns:
+        pd.DataFrame: One row per pipeline run, the first row being the exact pipeline.
+    """
+    modes = default_modes() if modes is None else modes
+    settings = (nr_similar_words, similarity_threshold, buzzwords, sensitivity_threshold)
+    columns = ['mode', 'recall_at_k', 'buzzwords_spearman', 'dimension_spearman', 'joined_spearman', 'only_in_exact', 'only_in_mode',
+               'jaccard', 'load_seconds', 'neighbour_seconds', 'pipeline_seconds', 'model_mb', 'peak_memory_mb']
+
+    with tempfile.TemporaryDirectory(prefix="regression_") as output_dir:
+        exact = run_pipeline(lambda: load_model_and_data(path_to_model, path_to_input_words, language)[0],
+                             path_to_input_words, language, *settings, output_dir)
+    w2v = exact["vectors"]
+    exact_words = set(exact["joined"]['similar_word'])
+
+    report = [["exact", 1.0, 1.0, 1.0, 1.0, 0, 0, 1.0] + [exact[column] for column in columns[8:]]]
+    differences = []
+    for mode_name, build_vectors in modes.items():
+        with tempfile.TemporaryDirectory(prefix="regression_") as output_dir:
+            result = run_pipeline(lambda: build_vectors(w2v), path_to_input_words, language, *settings, output_dir)
+        vectors = result["vectors"]
+        if isinstance(vectors, ShardedKeyedVectors):
+            vectors.close()
+            if getattr(vectors, "temporary", False):
+                shutil.rmtree(vectors.shard_dir)
+
+        mode_words = set(result["joined"]['similar_word'])
+        only_in_exact, only_in_mode = exact_words - mode_words, mode_words - exact_words
+        differences.extend([mode_name, word, "only_in_exact"] for word in sorted(only_in_exact))
+        differences.extend([mode_name, word, "only_in_mode"] for word in sorted(only_in_mode))
+
+        report.append([
+            mode_name,
+            recall_at_k(exact["neighbours"], result["neighbours"]),
+            rank_correlation(exact["buzzwords"], result["buzzwords"]),
+            rank_correlation(exact["dimension"], result["dimension"]),
+            rank_correlation(exact["joined"], result["joined"]),
+            len(only_in_exact),
+            len(only_in_mode),
+            len(exact_words & mode_words) / len(exact_words | mode_words) if exact_words | mode_words else 1.0,
+        ] + [result[column] for column in columns[8:]])
+
+    report_df = pd.DataFrame(report, columns=columns)
+    report_df.to_csv("output/regression_report.csv", index=False)
+    pd.DataFrame(differences, columns=['mode', 'similar_word', 'difference']).to_csv("output/regression_differences.csv", index=False)
+
+    return report_df
+
+
+if __name__ == "__main__":
+    print(regression_harness())
@@ -5,11 +5,12 @@ from nltk.corpus import stopwords
 import os
 import gensim
 import numpy as np
+from sharded_search import ShardedKeyedVectors
 
 
 
 
-def load_model_and_data(path_to_model, path_to_input_words, language):
+def load_model_and_data(path_to_model, path_to_input_words, language, shard_dir=None):
     """
     Load a Word2Vec model and input words from macht.sprache.
 
@@ -17,21 +18,39 @@ def load_model_and_data(path_to_model, path_to_input_words, language):
         path_to_model (str): Path to the Word2Vec model file.
         path_to_input_words (str): Path to the input words JSON file.
         language (str): Language for selecting input words.
+        shard_dir (str, optional): Directory of a partitioned vocabulary (see sharded_search.py). If given, the
+            partitions are used instead of the model file, which allows models larger than the available RAM.
 
     Returns:
-        gensim.models.Word2Vec: Loaded Word2Vec model.
+        gensim.models.Word2Vec or ShardedKeyedVectors: Loaded Word2Vec model.
         pd.Series: Input words filtered by the specified language.
     """
-    w2v = gensim.models.Word2Vec.load(path_to_model).wv
+    w2v = ShardedKeyedVectors(shard_dir) if shard_dir else gensim.models.Word2Vec.load(path_to_model).wv
 
-    input_words_en_de = pd.read_json(path_to_input_words)
-    input_words = input_words_en_de[input_words_en_de['lemma_lang'] == language]['lemma'].reset_index(drop=True)
+    input_words = load_input_words(path_to_input_words, language)
     
     return w2v, input_words
 
 
 
-def generate_similar_words(w2v, input_words, nr_similar_words, similarity_threshold):
+def load_input_words(path_to_input_words, language):
+    """
+    Load the input words from macht.sprache.
+
+    Args:
+        path_to_input_words (str): Path to the input words JSON file.
+        language (str): Language for selecting input words.
+
+    Returns:
+        pd.Series: Input words filtered by the specified language.
+    """
+    input_words_en_de = pd.read_json(path_to_input_words)
+    return input_words_en_de[input_words_en_de['lemma_lang'] == language]['lemma'].reset_index(drop=True)
+
+
+
+def generate_similar_words(w2v, input_words, nr_similar_words, similarity_threshold,
+    path_to_similarity_values=os.path.join('util', 'similar_words_with_similarity_value')):
     """
     Generate lists of similar words to macht.sprache words.
 
@@ -40,6 +59,7 @@ def generate_similar_words(w2v, input_words, nr_similar_words, similarity_thresh
         input_words (pd.Series): Input words.
         nr_similar_words (int): Number of similar words to retrieve.
         similarity_threshold (float): Minimum similarity threshold.
+        path_to_similarity_values (str, optional): Path the similar words with their similarity values are written to.
 
     Returns:
         pd.DataFrame: DataFrame with input words, similar words, and similarity values.
@@ -48,10 +68,12 @@ def generate_similar_words(w2v, input_words, nr_similar_words, similarity_thresh
     input_and_similar_words['similar_words'] = ''
     input_and_similar_words['words with similarity value'] = ''
 
+    # Partitioned models search the neighbours of all input words in one parallel pass
+    batch_results = w2v.most_similar_batch(input_words, topn=nr_similar_words) if hasattr(w2v, "most_similar_batch") else None
 
     for index, item in input_words.items():
         try: 
-            most_similar_words = w2v.most_similar(item, topn=nr_similar_words)
+            most_similar_words = batch_results[item] if batch_results is not None else w2v.most_similar(item, topn=nr_similar_words)
             input_and_similar_words.at[index, 'similar_words'] = [tuple[0] for tuple in most_similar_words if tuple[1] > similarity_threshold]
             input_and_similar_words.at[index, 'words with similarity value'] =   [tuple for tuple in most_similar_words]
         except: 
@@ -60,7 +82,7 @@ def generate_similar_words(w2v, input_words, nr_similar_words, similarity_thresh
 
     input_and_similar_words.dropna(inplace=True) # remove all the rows of input words that could not be found in the lexicon
     input_and_similar_words.drop(labels=['index'], axis=1, inplace=True)
-    input_and_similar_words[['input_word', 'words with similarity value']].to_csv("util/similar_words_with_similarity_value", index=False)
+    input_and_similar_words[['input_word', 'words with similarity value']].to_csv(path_to_similarity_values, index=False)
     
     return input_and_similar_words
 
@@ -89,7 +111,7 @@ def filter_for_sensitivity(w2v, input_and_similar_words, buzzwords, sensitivity_
                 sensitive_similarity = sensitive_similarity + w2v.similarity(similar_word, buzzword)
             # Weighting the sensitive_similarity
             weighted_sensitive_similarity = sensitive_similarity/len(buzzwords)
-            sensitive_words_df.loc[len(sensitive_words_df)] = [similar_word, round(weighted_sensitive_similarity, 3), row['input_word']]
+            sensitive_words_df.loc[len(sensitive_words_df)] = [similar_word, round(float(weighted_sensitive_similarity), 3), row['input_word']]
             
 
 
@@ -108,19 +130,30 @@ def sensitive_buzzwords_approach(nr_similar_words=50, similarity_threshold=0.6,
     sensitivity_threshold=0.4,
     language='en', buzzwords=['discrimination', 'political'], 
     path_to_model= os.path.join('models', 'word2vec_test.model'),
-    path_to_input_words=os.path.join('macht.sprache_input', 'macht.sprache_words.json')):
+    path_to_input_words=os.path.join('macht.sprache_input', 'macht.sprache_words.json'),
+    shard_dir=None, w2v=None,
+    path_to_output=os.path.join('output', 'output_buzzwords_approach.csv'),
+    path_to_similarity_values=os.path.join('util', 'similar_words_with_similarity_value')):
     """
     Call all functions from above to execute the buzzwords approach.
+    Pass shard_dir to search a partitioned vocabulary (see sharded_search.py) instead of loading the model into memory,
+    or w2v to use word vectors that are already loaded.
     """
 
     # Load the pretrained model and the terms from macht.sprache
-    w2v, input_words = load_model_and_data(path_to_model, path_to_input_words, language)
+    if w2v is None:
+        w2v, input_words = load_model_and_data(path_to_model, path_to_input_words, language, shard_dir)
+    else:
+        input_words = load_input_words(path_to_input_words, language)
     # Generate a dataframe of similar words to the words from macht.sprache
-    input_and_similar_words = generate_similar_words(w2v, input_words, nr_similar_words, similarity_threshold)
+    input_and_similar_words = generate_similar_words(w2v, input_words, nr_similar_words, similarity_threshold, path_to_similarity_values)
     # Filter similar words for sensitivity based on the similarity to social justice buzzwords. Sort the words according to their sensitivity score.
     sensitive_words_df = filter_for_sensitivity(w2v, input_and_similar_words, buzzwords, sensitivity_threshold)
     # Output the list of new terms (with their sensitivity score)
-    sensitive_words_df.to_csv("output/output_buzzwords_approach.csv", index=False)
+    sensitive_words_df.to_csv(path_to_output, index=False)
+
+    if shard_dir:
+        w2v.close()
     
     return sensitive_words_df
 
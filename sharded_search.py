@@ -0,0 +1,206 @@
+import numpy as np
+import os
+import json
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+
+def write_vocabulary_shards(dataset, shard_dir, n_shards=4, chunk_size=100000):
+    """
+    Splits the vocabulary matrix of an embedding model into row partitions and stores them on disk.
+    Each partition is written as a .npy file together with the norms of its rows, so that it can later be
+    memory mapped and searched without loading the full matrix into RAM. The rows are copied chunk by chunk,
+    which keeps memory usage low even if the model itself was loaded with mmap='r'.
+
+    Args:
+        dataset (gensim.models.keyedvectors.KeyedVectors): The word vectors model to be partitioned.
+        shard_dir (str): The directory the partitions and the vocabulary index are written to.
+        n_shards (int, optional): The number of row partitions. Defaults to 4.
+        chunk_size (int, optional): The number of rows copied at once. Defaults to 100000.
+
+    Returns:
+        str: The path of the directory containing the partitions.
+    """
+    dataset = dataset.wv if hasattr(dataset, "wv") else dataset
+    os.makedirs(shard_dir, exist_ok=True)
+
+    n_rows, n_dims = dataset.vectors.shape
+    bounds = np.unique(np.linspace(0, n_rows, n_shards + 1, dtype=int)) # avoid empty partitions for tiny vocabularies
+    shards = []
+
+    for shard_nr, (start, end) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist())):
+        vectors_file = f"shard_{shard_nr}.npy"
+        norms_file = f"shard_{shard_nr}_norms.npy"
+        vectors = np.lib.format.open_memmap(os.path.join(shard_dir, vectors_file), mode='w+', dtype=np.float32, shape=(end - start, n_dims))
+        norms = np.lib.format.open_memmap(os.path.join(shard_dir, norms_file), mode='w+', dtype=np.float32, shape=(end - start,))
+
+        for chunk_start in range(start, end, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, end)
+            chunk = np.asarray(dataset.vectors[chunk_start:chunk_end], dtype=np.float32)
+            vectors[chunk_start - start:chunk_end - start] = chunk
+            norms[chunk_start - start:chunk_end - start] = np.linalg.norm(chunk, axis=1)
+
+        vectors.flush()
+        norms.flush()
+        del vectors, norms
+        shards.append({"vectors": vectors_file, "norms": norms_file, "offset": int(start)})
+
+    # The vocabulary index maps every row to its word and every partition to its first row
+    with open(os.path.join(shard_dir, "index.json"), 'w', encoding='utf-8') as f:
+        json.dump({"keys": list(dataset.index_to_key), "shards": shards}, f)
+
+    print(f"Wrote {n_rows} vectors in {len(shards)} partitions to {shard_dir}")
+    return shard_dir
+
+
+def search_shard(shard_dir, shard, queries, topn, block_size=50000):
+    """
+    Finds the local top-k rows of a single partition for every query.
+    The function is executed in a separate worker process. The partition is memory mapped and processed in blocks
+    of rows, so only a block of the partition and the running top-k candidates are held in memory at once.
+
+    Args:
+        shard_dir (str): The directory containing the partitions.
+        shard (dict): The entry of the partition in the vocabulary index ("vectors", "norms" and "offset").
+        queries (np.ndarray): Unit length query vectors with the shape (number of queries, dimensions).
+        topn (int): The number of neighbours to keep per query.
+        block_size (int, optional): The number of rows compared to the queries at once. Defaults to 50000.
+
+    Returns:
+        tuple: Two arrays with the shape (number of queries, k), the global row indices and their cosine similarities.
+    """
+    vectors = np.load(os.path.join(shard_dir, shard["vectors"]), mmap_mode='r')
+    norms = np.load(os.path.join(shard_dir, shard["norms"]), mmap_mode='r')
+
+    top_indices = np.empty((len(queries), 0), dtype=np.int64)
+    top_similarities = np.empty((len(queries), 0), dtype=np.float32)
+
+    for block_start in range(0, len(vectors), block_size):
+        block_end = min(block_start + block_size, len(vectors))
+        similarities = (queries @ vectors[block_start:block_end].T) / np.maximum(norms[block_start:block_end], 1e-12)
+
+        # Merge the block with the candidates kept so far. argpartition only separates the k best
+        # candidates, sorting them is left to the heap merge of the partial results.
+        candidate_indices = np.hstack([top_indices, np.broadcast_to(np.arange(block_start, block_end), similarities.shape)])
+        candidate_similarities = np.hstack([top_similarities, similarities])
+        k = min(topn, candidate_similarities.shape[1])
+        best = np.argpartition(-candidate_similarities, k - 1, axis=1)[:, :k]
+        top_indices = np.take_along_axis(candidate_indices, best, axis=1)
+        top_similarities = np.take_along_axis(candidate_similarities, best, axis=1)
+
+    return top_indices + shard["offset"], top_similarities
+
+
+class ShardedKeyedVectors:
+    """
+    Read-only word vectors stored as row partitions on disk (see write_vocabulary_shards).
+    The class mirrors the parts of the gensim KeyedVectors interface used in this project (key_to_index, item access,
+    similarity and most_similar), so it can be passed to generate_similar_words, filter_for_sensitivity and
+    calculate_political_sensitivity instead of a model that does not fit into memory.
+    Every partition is searched in a separate process and the partial results are merged with a heap.
+    """
+
+    def __init__(self, shard_dir, n_workers=None):
+        """
+        Args:
+            shard_dir (str): The directory containing the partitions and the vocabulary index.
+            n_workers (int, optional): The number of worker processes. Defaults to the number of partitions.
+        """
+        with open(os.path.join(shard_dir, "index.json"), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+
+        self.shard_dir = shard_dir
+        self.shards = index["shards"]
+        self.index_to_key = index["keys"]
+        self.key_to_index = {key: i for i, key in enumerate(self.index_to_key)}
+        self.n_workers = n_workers or len(self.shards)
+        self._offsets = [shard["offset"] for shard in self.shards]
+        self._vectors = [np.load(os.path.join(shard_dir, shard["vectors"]), mmap_mode='r') for shard in self.shards]
+        self._executor = None
+
+    def __contains__(self, word):
+        return word in self.key_to_index
+
+    def __getitem__(self, word):
+        row = self.key_to_index[word]
+        shard_nr = np.searchsorted(self._offsets, row, side='right') - 1
+        return np.array(self._vectors[shard_nr][row - self._offsets[shard_nr]])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """
+        Starts the worker processes. This happens on the first search at the latest; call it beforehand
+        to start the processes before any threads of the calling program.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_workers)
+            # The processes are only created with the first task
+            self._executor.submit(int).result()
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def similarity(self, w1, w2):
+        """
+        Calculates the cosine similarity between two words, analogous to KeyedVectors.similarity.
+        """
+        v1, v2 = self[w1], self[w2]
+        return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+
+    def most_similar(self, word, topn=10):
+        """
+        Finds the topn most similar words to a single word, analogous to KeyedVectors.most_similar.
+        Raises a KeyError if the word is not in the vocabulary.
+        """
+        if word not in self.key_to_index:
+            raise KeyError(f"Key '{word}' not present")
+        return self.most_similar_batch([word], topn=topn)[word]
+
+    def most_similar_batch(self, words, topn=10):
+        """
+        Finds the topn most similar words for a whole list of words in one pass over the partitions.
+        Words that are not in the vocabulary are skipped.
+
+        Args:
+            words (list of str): The query words.
+            topn (int, optional): The number of similar words per query. Defaults to 10.
+
+        Returns:
+            dict: Maps every query word found in the vocabulary to a list of (word, similarity) tuples,
+            sorted by descending similarity. The query word itself is excluded, as in gensim.
+        """
+        words = [word for word in dict.fromkeys(words) if word in self.key_to_index]
+        if not words:
+            return {}
+
+        queries = np.array([self[word] for word in words], dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        self.open()
+
+        # Request one additional neighbour per partition, as the query word itself is among the results
+        futures = [self._executor.submit(search_shard, self.shard_dir, shard, queries, topn + 1) for shard in self.shards]
+        partial_results = [future.result() for future in futures]
+
+        results = {}
+        for query_nr, word in enumerate(words):
+            own_row = self.key_to_index[word]
+            candidates = (
+                (float(similarity), int(row))
+                for rows, similarities in partial_results
+                for row, similarity in zip(rows[query_nr], similarities[query_nr])
+                if row != own_row
+            )
+            results[word] = [(self.index_to_key[row], similarity) for similarity, row in heapq.nlargest(topn, candidates)]
+
+        return results
@@ -0,0 +1,329 @@
+import pandas as pd
+import os
+import time
+import queue
+import threading
+from openai import OpenAI
+from sensitive_buzzwords_approach import load_model_and_data
+from informative_dimension_approach import calculate_political_sensitivity, load_dimension_from_json, load_sensitive_terms
+from join_csvs import join_sensitive_words
+from gpt_api_calls import read_api_key, load_system_prompt, send_request, write_response, write_bilingual_response
+
+
+def stream_neighbours(w2v, words, topn, chunk_size=20):
+    """
+    Yields the most similar words of every word, searching the words in small chunks. Word vectors that offer
+    most_similar_batch (e.g. ShardedKeyedVectors) thus scan their partitions once per chunk instead of once per word,
+    while the first results are still available early.
+
+    Yields:
+        tuple: (word, list of (similar_word, similarity) tuples) for every word found in the lexicon.
+    """
+    words = list(words)
+    for chunk_start in range(0, len(words), chunk_size):
+        chunk = words[chunk_start:chunk_start + chunk_size]
+        if hasattr(w2v, "most_similar_batch"):
+            batch_results = w2v.most_similar_batch(chunk, topn=topn)
+        else:
+            batch_results = {}
+            for word in chunk:
+                try:
+                    batch_results[word] = w2v.most_similar(word, topn=topn)
+                except KeyError:
+                    continue # words that could not be found in the lexicon
+        for word in chunk:
+            if word in batch_results:
+                yield word, batch_results[word]
+
+
+def stream_buzzword_candidates(w2v, input_words, nr_similar_words, similarity_threshold, buzzwords, sensitivity_threshold, chunk_size=20):
+    """
+    Yields the scored candidates of the buzzwords approach one input word at a time, instead of returning them
+    after all input words have been processed. The scores are the same as in filter_for_sensitivity.
+
+    Yields:
+        tuple: (similar_word, sensitivity_score, input_word) for every candidate above the sensitivity threshold.
+    """
+    for input_word, most_similar_words in stream_neighbours(w2v, input_words, nr_similar_words, chunk_size):
+        for similar_word, similarity in most_similar_words:
+            if similarity <= similarity_threshold:
+                continue
+            sensitive_similarity = 0
+            for buzzword in buzzwords:
+                sensitive_similarity = sensitive_similarity + w2v.similarity(similar_word, buzzword)
+            weighted_sensitive_similarity = round(sensitive_similarity/len(buzzwords), 3)
+            if weighted_sensitive_similarity > sensitivity_threshold:
+                yield similar_word, weighted_sensitive_similarity, input_word
+
+
+def stream_dimension_candidates(model, dimension, sensitive_terms, chunk_size=20):
+    """
+    Yields the scored candidates of the informative dimension approach one input term at a time.
+    The 50 neighbours of every term are searched in chunks and passed to calculate_political_sensitivity,
+    as in sensitive_dimension_approach.
+
+    Yields:
+        tuple: (similar_word, sensitivity_score, input_word) for the top 10 words of every term.
+    """
+    for term, most_similar_words in stream_neighbours(model, sensitive_terms, 50, chunk_size):
+        for similar_word, sensitivity_score in calculate_political_sensitivity(model, dimension, term, most_similar_words):
+            yield similar_word, sensitivity_score, term
+
+
+def interleave(*streams):
+    """
+    Yields (stream number, item) pairs by taking one item of each stream in turn, so that the running
+    normalisation of every approach is based on a similar share of its candidates.
+    """
+    streams = [iter(stream) for stream in streams]
+    active = list(range(len(streams)))
+    while active:
+        for stream_nr in list(active):
+            try:
+                yield stream_nr, next(streams[stream_nr])
+            except StopIteration:
+                active.remove(stream_nr)
+
+
+class StreamingJoiner:
+    """
+    Incremental version of join_sensitive_words for two streams of scored candidates
+    (0: buzzwords approach, 1: informative dimension approach).
+
+    While the candidates arrive, the joiner keeps a lower bound of the final joined score of every word, i.e. the
+    lowest score the word can still end up with, whatever candidates follow. Once all candidates are known,
+    finalise() applies the exact min/max normalisation of join_sensitive_words.
+    """
+
+    def __init__(self, upper_bounds=(1.0, 1.0)):
+        """
+        Args:
+            upper_bounds (tuple, optional): The highest possible score of each approach. Both scores are (absolute)
+                cosine similarities, so they can not exceed 1. Defaults to (1.0, 1.0).
+        """
+        # Per approach: similar_word -> [sensitivity_score, list of input words]
+        self.sources = ({}, {})
+        self.minimum = [float('inf'), float('inf')]
+        self.maximum = [float('-inf'), float('-inf')]
+        self.upper_bounds = upper_bounds
+        self.finished = [False, False]
+
+    def track(self, source_nr, stream):
+        """
+        Passes on the candidates of a stream and marks the approach as finished once the stream is exhausted.
+        """
+        yield from stream
+        self.finished[source_nr] = True
+
+    def add(self, source_nr, similar_word, sensitivity_score, input_word):
+        """
+        Adds a candidate of one approach and returns the lower bound of the joined score of the word.
+        The buzzwords approach collects all input words of a word (as filter_for_sensitivity does), the dimension approach
+        keeps the input word with the highest score (as sensitive_dimension_approach does).
+        """
+        entries = self.sources[source_nr]
+        if similar_word not in entries:
+            entries[similar_word] = [sensitivity_score, [input_word]]
+        elif source_nr == 0:
+            if input_word not in entries[similar_word][1]:
+                entries[similar_word][1].append(input_word)
+        elif sensitivity_score > entries[similar_word][0]:
+            entries[similar_word] = [sensitivity_score, [input_word]]
+
+        self.minimum[source_nr] = min(self.minimum[source_nr], sensitivity_score)
+        self.maximum[source_nr] = max(self.maximum[source_nr], sensitivity_score)
+        return self.guaranteed_score(similar_word)
+
+    def guaranteed_score(self, similar_word):
+        """
+        Calculates the lowest joined score a word can still end up with.
+
+        The normalised score (score - min) / (max - min) only decreases when the final minimum of an approach rises
+        or its maximum grows. The minimum can only fall and the maximum can at most reach the upper bound of the
+        approach, so the current minimum and the upper bound give the worst case (the final maximum once the approach
+        is finished). An approach that has not yet produced the word may still add it with a normalised score of 0.
+        """
+        scores = []
+        n_sources = 0
+        for source_nr, entries in enumerate(self.sources):
+            if similar_word in entries:
+                maximum = self.maximum[source_nr] if self.finished[source_nr] else self.upper_bounds[source_nr]
+                value_range = maximum - self.minimum[source_nr]
+                scores.append((entries[similar_word][0] - self.minimum[source_nr]) / value_range if value_range > 0 else 0.0)
+                n_sources += 1
+            elif not self.finished[source_nr]:
+                n_sources += 1
+        return sum(scores) / n_sources
+
+    def input_words(self, similar_word):
+        """
+        Returns the input words of a word collected so far, joined as in the output files.
+        """
+        return ', '.join(dict.fromkeys(word for entries in self.sources if similar_word in entries for word in entries[similar_word][1]))
+
+    def finalise(self):
+        """
+        Builds the outputs of both approaches and their exact join from all candidates.
+
+        Returns:
+            tuple: DataFrames in the format of output_buzzwords_approach.csv, output_dimension_approach.csv and joined_sensitive_words.csv.
+        """
+        dfs = []
+        for entries in self.sources:
+            entries = [(word, score, ', '.join(input_words)) for word, (score, input_words) in entries.items()]
+            entries.sort(key=lambda x: x[1], reverse=True)
+            dfs.append(pd.DataFrame(entries, columns=['similar_word', 'sensitivity_score', 'input_word']))
+
+        return dfs[0], dfs[1], join_sensitive_words(dfs[0].copy(), dfs[1].copy())
+
+
+def description_worker(client, word_queue, sys_prompt, model, batchsize, output_language, write_lock, stats):
+    """
+    Takes confirmed words from the queue, sends them to the OpenAI API in batches and writes the descriptions.
+    The worker stops after it received None from the queue; a last, partial batch is sent before.
+
+    Args:
+        client (openai.OpenAI): The OpenAI client.
+        word_queue (queue.Queue): Bounded queue of (similar_word, input_word) tuples.
+        sys_prompt (str): The system prompt to use for the requests.
+        model (str): specifies which OpenAI model to use for the requests.
+        batchsize (int): The number of words per call to the API.
+        output_language (str): 'english', 'german' or 'bilingual'.
+        write_lock (threading.Lock): Lock shared by all workers to write the output files one after another.
+        stats (dict): Shared dict collecting "tokens" and the time of the "first_description".
+    """
+    done = False
+    while not done:
+        batch = []
+        while len(batch) < batchsize:
+            item = word_queue.get()
+            if item is None:
+                done = True
+                break
+            batch.append(item)
+        if not batch:
+            continue
+
+        request = [("word: " + word, "word_cloud_reference: " + input_word) for word, input_word in batch]
+        words = [word for word, _ in batch]
+        try:
+            response_format = {"type": "json_object"} if output_language == 'bilingual' else None
+            content, toks, post_chat = send_request(client, request, sys_prompt, model, response_format=response_format)
+        except Exception as e:
+            print(f"Skipping the words {words}: {e}")
+            continue
+
+        # The tokens of a returned call are paid for, even if its response can not be used
+        with write_lock:
+            stats["tokens"] += toks
+            try:
+                if output_language == 'bilingual':
+                    write_bilingual_response(content, words, {'english': 'output/gpt_descriptions_english.json', 'german': 'output/gpt_descriptions_german.json'}, post_chat)
+                else:
+                    write_response(content, f'output/gpt_descriptions_{output_language}.json', post_chat)
+            except Exception as e:
+                print(f"Skipping invalid response for the words {words}: {e}")
+                continue
+            stats.setdefault("first_description", time.time())
+
+
+def streaming_pipeline(nr_similar_words=50, similarity_threshold=0.6, sensitivity_threshold=0.4,
+    language='en', buzzwords=['discrimination', 'political'],
+    path_to_model=os.path.join('models', 'word2vec_test.model'),
+    path_to_input_words=os.path.join('macht.sprache_input', 'macht.sprache_words.json'),
+    shard_dir=None,
+    describe=True, confirm_threshold=0.7, n_calls=2, batchsize=5, n_workers=2, queue_size=20,
+    output_language='english', model="gpt-4-0125-preview", api_key_file='API_KEY'):
+    """
+    Runs both approaches, the join and the description generation as one streaming pipeline.
+
+    Both approaches yield their scored candidates while they are produced and are joined incrementally.
+    A word is confirmed as soon as its joined score can no longer fall below confirm_threshold, whatever candidates
+    follow (see StreamingJoiner.guaranteed_score). Confirmed words are put into a bounded queue, from which description
+    workers send them to the OpenAI API. The CPU-bound scoring and the network-bound description generation thus overlap.
+    Once all candidates are known, the outputs of both approaches and their join are written with the exact
+    normalisation, and the remaining budget is spent on the highest ranked words that were not described yet.
+    Be careful, describe=True may cost money; at most n_calls * batchsize words are described.
+
+    Unlike the sequential pipeline, both approaches use the model at path_to_model (or shard_dir), and words with
+    equal scores may be listed in a different order.
+
+    Returns:
+        pd.DataFrame: The joined sensitive words, as written to joined_sensitive_words.csv.
+    """
+    if describe and n_workers < 1:
+        raise ValueError("describe=True needs at least one description worker (n_workers >= 1)")
+
+    timestamp_start = time.time()
+
+    # Both approaches share one model
+    w2v, input_words = load_model_and_data(path_to_model, path_to_input_words, language, shard_dir)
+    dimension = load_dimension_from_json("util/best_dimension.json")
+    sensitive_terms, _ = load_sensitive_terms("util/macht.sprache_words.json", w2v)
+
+    word_queue = queue.Queue(maxsize=queue_size)
+    stats = {"tokens": 0}
+    workers = []
+    if describe:
+        if shard_dir:
+            # Start the search processes before the description threads, so they are not forked from a threaded process
+            w2v.open()
+        client = OpenAI(api_key=read_api_key(api_key_file))
+        sys_prompt = load_system_prompt(output_language, 'englisch' if output_language == 'german' else 'English')
+        write_lock = threading.Lock()
+        workers = [threading.Thread(target=description_worker, args=(client, word_queue, sys_prompt, model, batchsize, output_language, write_lock, stats))
+                   for _ in range(n_workers)]
+        for worker in workers:
+            worker.start()
+
+    joiner = StreamingJoiner()
+    confirmed_words = []
+    max_confirmed_words = n_calls * batchsize if describe else 0
+    try:
+        candidates = interleave(
+            joiner.track(0, stream_buzzword_candidates(w2v, input_words, nr_similar_words, similarity_threshold, buzzwords, sensitivity_threshold)),
+            joiner.track(1, stream_dimension_candidates(w2v, dimension, sensitive_terms)),
+        )
+        for source_nr, (similar_word, sensitivity_score, input_word) in candidates:
+            guaranteed_score = joiner.add(source_nr, similar_word, sensitivity_score, input_word)
+            if guaranteed_score >= confirm_threshold and similar_word not in confirmed_words and len(confirmed_words) < max_confirmed_words:
+                confirmed_words.append(similar_word)
+                # blocks while the queue is full, so the scoring can not run arbitrarily far ahead of the descriptions
+                word_queue.put((similar_word, joiner.input_words(similar_word)))
+
+        # Exact normalisation and join, once all candidates are known
+        buzzwords_df, dimension_df, joined_df = joiner.finalise()
+        buzzwords_df.to_csv("output/output_buzzwords_approach.csv", index=False)
+        dimension_df.to_csv('output/output_dimension_approach.csv', index=False)
+        joined_df.to_csv('output/joined_sensitive_words.csv', index=False)
+        print("scoring finished: " + str(time.time() - timestamp_start))
+        print(f"{len(confirmed_words)} words were confirmed for descriptions during the scoring")
+
+        # Second phase: spend the remaining budget on the best words of the final ranking
+        for row in joined_df.itertuples():
+            if len(confirmed_words) >= max_confirmed_words or row.sensitivity_score < confirm_threshold:
+                break
+            if row.similar_word not in confirmed_words:
+                confirmed_words.append(row.similar_word)
+                word_queue.put((row.similar_word, row.input_word))
+    finally:
+        if shard_dir:
+            w2v.close()
+        # Always stop the workers, also if the scoring failed
+        for _ in workers:
+            word_queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    if describe:
+        if "first_description" in stats:
+            print("first description: " + str(stats["first_description"] - timestamp_start))
+        print(f"Total tokens used: {stats['tokens']}")
+        with open('util/tokens_used.csv', 'a') as file:
+            file.write(f"{stats['tokens']}\n")
+
+    return joined_df
+
+
+if __name__ == "__main__":
+    streaming_pipeline()